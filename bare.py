@@ -20,6 +20,10 @@ MATETEST  = True	# if True, include draw and mate on next move detection in the
 
 b = c.Board()
 NODES = 0
+STOP = None	# threading.Event passed to getmove(); the search is aborted when it is set
+
+class SearchAborted(Exception):
+	"Raised inside the search when STOP is set"
 
 def getpos(b):
 	"Get positional-play value for a board"
@@ -54,6 +58,8 @@ def searchmax(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 1023 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if ply >= MAXPLIES:
 		return getval(b)
 	for x in order(b, ply):
@@ -71,6 +77,8 @@ def searchmin(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 1023 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if ply >= MAXPLIES:
 		return getval(b)
 	for x in order(b, ply):
@@ -109,9 +117,11 @@ def pm():
 	else:
 		return -1
 
-def getmove(b, silent = False, usebook = False):
+def getmove(b, silent = False, usebook = False, stop = None):
 	"Get move list for board"
-	global COMPC, PLAYC, MAXPLIES, NODES
+	global COMPC, PLAYC, MAXPLIES, NODES, STOP
+
+	STOP = stop
 
 	lastpos = getpos(b)
 	ll = []
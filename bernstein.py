@@ -19,6 +19,10 @@ MATETEST = True
 b = c.Board()
 PV = []		# array for primary variation
 NODES = 0
+STOP = None	# threading.Event passed to getmove(); the search is aborted when it is set
+
+class SearchAborted(Exception):
+	"Raised inside the search when STOP is set"
 
 def ppos(x, r):
 	print(c.SQUARE_NAMES[x], r)
@@ -254,6 +258,8 @@ def searchmax(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 1023 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if ply >= MAXPLIES:
 		###print([str(q) for q in b.move_stack])
 		return getneg(b), [str(q) for q in b.move_stack]
@@ -302,9 +308,11 @@ def order(b, ply):
 	bm = [q[0] for q in am]
 	return bm
 
-def getmove(b, silent = False, usebook = False):
+def getmove(b, silent = False, usebook = False, stop = None):
 	"Get move list for board"
-	global COMPC, PLAYC, MAXPLIES, NODES
+	global COMPC, PLAYC, MAXPLIES, NODES, STOP
+
+	STOP = stop
 
 	ll = []
 
@@ -31,6 +31,11 @@ NODES = 0
 wtime, btime, movestogo, movetime = -1, -1, -1, -1	# time management variables
 endtime = time.time() + 1e8
 searchok = True
+STOP = None	# threading.Event passed to getmove(); the search ends early when it is set
+
+def stopped():
+	"Check if the interface asked to stop the search"
+	return STOP is not None and STOP.is_set()
 
 def getpos(b):
 	"Get positional-play value for a board for both players"
@@ -104,9 +109,10 @@ def searchmax(b, ply, alpha, beta):
 	v = PV
 	for x in o:
 		b.push(x)
-		if (time.time() < endtime and NODES < MAXNODES) or MAXPLIES == 1:
+		if (time.time() < endtime and NODES < MAXNODES and (NODES & 1023 or not stopped())) or MAXPLIES == 1:
 			t, vv = searchmax(b, ply - 1, -beta, -alpha)
 		else:
+			b.pop()		# leave the board as we found it; getmove discards this result
 			searchok = False
 			return alpha, v
 		t = -t
@@ -214,9 +220,11 @@ def setendtime():
 		thetime = btime / 1000.
 	endtime = time.time() + thetime / (movestogo + 3)
 
-def getmove(b, silent = False, usebook = True):
+def getmove(b, silent = False, usebook = True, stop = None):
 	"Get value and primary variation for board"
-	global COMPC, PLAYC, MAXPLIES, PV, NODES, searchok
+	global COMPC, PLAYC, MAXPLIES, PV, NODES, searchok, STOP
+
+	STOP = stop
 
 	if b.turn == c.WHITE:
 		COMPC = c.WHITE
@@ -256,8 +264,11 @@ def getmove(b, silent = False, usebook = True):
 			ab = t  + .5
 	setendtime()	# set end time for computation based on time control
 
+	done = False	# has at least one iteration finished?
 	for MAXPLIES in range(1, DEPTH):	# iterative deepening loop
-		while time.time() < endtime and NODES < MAXNODES:
+		if stopped():
+			break
+		while time.time() < endtime and NODES < MAXNODES and not stopped():
 			searchok = True
 			t, newPV = searchmax(b.copy(), MAXPLIES, aa, ab)
 			newPV = newPV[len(b.move_stack):]	# separate principal variation from moves already played
@@ -268,11 +279,17 @@ def getmove(b, silent = False, usebook = True):
 		# if search is succesful and complete, then update PV:
 		if searchok:
 			PV = newPV
+			done = True
+			bt = t
 			print('info depth %d score cp %d time %d nodes %d pv %s' % (MAXPLIES, 100 * t,
 				1000 * (time.time() - start), NODES, ' '.join(PV)))
 			sys.stdout.flush()
 			if PV and (t < -500 or t > 500):	# found a checkmate
 				break
+	if stopped():
+		if not done:
+			return 0, []	# PV is still from the previous move
+		return bt, PV	# t is from the aborted iteration
 	return t, PV
 
 if __name__ == '__main__':
@@ -15,6 +15,10 @@ MAXPLIES = 3	# maximum search depth
 
 b = c.Board()
 NODES = 0
+STOP = None	# threading.Event passed to getmove(); the search is aborted when it is set
+
+class SearchAborted(Exception):
+	"Raised inside the search when STOP is set"
 
 def getval(b):
 	"Get total piece value of board"
@@ -32,6 +36,8 @@ def searchmax(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 1023 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if ply >= MAXPLIES:
 		return getval(b)
 	for x in order(b, ply):
@@ -49,6 +55,8 @@ def searchmin(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 1023 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if ply >= MAXPLIES:
 		return getval(b)
 	for x in order(b, ply):
@@ -87,9 +95,11 @@ def pm():
 	else:
 		return -1
 
-def getmove(b, silent = False, usebook = False):
+def getmove(b, silent = False, usebook = False, stop = None):
 	"Get move list for board"
-	global COMPC, PLAYC, MAXPLIES, NODES
+	global COMPC, PLAYC, MAXPLIES, NODES, STOP
+
+	STOP = stop
 
 	ll = []
 	NODES = 0
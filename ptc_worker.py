@@ -2,13 +2,14 @@
 
 import pyturochamp as ptc
 import chess as c
-from multiprocessing import Queue, Process, cpu_count, set_start_method
+from multiprocessing import Queue, Process, Event, cpu_count, set_start_method
 from queue import Empty, Full
 
 # needed for Python 3.14 and later:
 set_start_method("fork")
 
 def worker():
+	ptc.STOP = abort	# lets searchmax/searchmin raise SearchAborted
 	while True:
 		try:
 			b, x, lastpos, compc, cr0, MAXPLIES, QPLIES, PSTAB, PDEAD, MATETEST = urlq.get()
@@ -36,17 +37,22 @@ def worker():
 				if b.is_castling(y):	# can we castle in the next move?
 					p += ptc.pm()
 
-			if compc == c.WHITE:
-				t = ptc.searchmin(b, 0, -1e6, 1e6)
+			try:
+				if compc == c.WHITE:
+					t = ptc.searchmin(b, 0, -1e6, 1e6)
+				else:
+					t = ptc.searchmax(b, 0, -1e6, 1e6)
+			except ptc.SearchAborted:
+				urlr.put(None)	# every job gets exactly one reply
 			else:
-				t = ptc.searchmax(b, 0, -1e6, 1e6)
-			urlr.put((x, p, t))
+				urlr.put((x, p, t))
 
 def start():
-	global num_worker_threads, urlq, urlr, new_data, program_run, ti
+	global num_worker_threads, urlq, urlr, abort, new_data, program_run, ti
 	num_w = cpu_count()	# determine number of worker processes automatically
 	urlq = Queue()		# query queue
 	urlr = Queue()		# result queue
+	abort = Event()		# set to abort the searches of all workers
 
 	for i in range(num_w):
 		ti = Process(target=worker)
@@ -3,125 +3,208 @@
 # XBoard/UCI interface to PyTuroChamp
 
 from __future__ import print_function
-import sys, datetime, os, threading, time
+import sys, datetime, os, io, threading, time, queue, re, importlib
 import chess as c
 import chess.pgn
 
-abc = "abcdefgh"
-nn = "12345678"
+MOVE_RE = re.compile(r'^([a-h][1-8][a-h][1-8])(?:=?([qrbnQRBN]))?$')  # coordinate move, e.g. e2e4 or e7e8=Q
 is_uci = True
 
+IS_LINUX = sys.platform.startswith('linux')
 PGN_ENABLE = os.getenv("PTC_PGN", "0").lower() in ("1","true","yes","on")
 
 # --- Unbuffered stdout so GUI sees bestmove immediately ---
 try:
     sys.stdout.reconfigure(line_buffering=True)
+    FLUSH = False   # every newline flushes already
 except Exception:
-    pass
+    FLUSH = True
 
 # --- Engine selection ---
-if sys.argv[-1] == 'newt':
-    import newt as p
-    lf = "Newt-log.txt"; mf = "Newt.pgn"; nm = "Newt"
-elif sys.argv[-1] == 'ptc':
-    import pyturochamp as p
-    lf = "PyTuroChamp-log.txt"; mf = "PyTuroChamp.pgn"; nm = "PyTuroChamp"
-elif sys.argv[-1] == 'bare':
-    import bare as p
-    lf = "Bare-log.txt"; mf = "Bare.pgn"; nm = "Bare"
-elif sys.argv[-1] == 'plan':
-    import plan as p
-    lf = "Plan-log.txt"; mf = "Plan.pgn"; nm = "Plan"
-elif sys.argv[-1] == 'shannon':
-    import shannon as p
-    lf = "Shannon-log.txt"; mf = "Shannon.pgn"; nm = "Shannon"
-elif sys.argv[-1] == 'soma':
-    import soma as p
-    lf = "SOMA-log.txt"; mf = "SOMA.pgn"; nm = "SOMA"
-elif sys.argv[-1] == 'torres':
-    import torres as p
-    lf = "Torres-log.txt"; mf = "Torres.pgn"; nm = "El Ajedrecista"
-elif sys.argv[-1] == 'bern':
-    import bernstein as p
-    lf = "Bernstein-log.txt"; mf = "Bernstein.pgn"; nm = "Bernstein"
-elif sys.argv[-1] == 'rmove':
-    import rmove as p
-    lf = "RMove-log.txt"; mf = "RMove.pgn"; nm = "Random Mover"
-elif sys.argv[-1] == 'adapt':
-    import adapt as p
-    lf = "Adapt-log.txt"; mf = "Adapt.pgn"; nm = "Simple Adaptive Engine"
+# parameter -> (module, log file, PGN file, engine name)
+ENGINES = {
+    'newt':      ('newt',              "Newt-log.txt",        "Newt.pgn",        "Newt"),
+    'ptc':       ('pyturochamp',       "PyTuroChamp-log.txt", "PyTuroChamp.pgn", "PyTuroChamp"),
+    'ptc_multi': ('pyturochamp_multi', "PyTuroChamp-log.txt", "PyTuroChamp.pgn", "PyTuroChamp Multi-Core"),
+    'bare':      ('bare',              "Bare-log.txt",        "Bare.pgn",        "Bare"),
+    'plan':      ('plan',              "Plan-log.txt",        "Plan.pgn",        "Plan"),
+    'shannon':   ('shannon',           "Shannon-log.txt",     "Shannon.pgn",     "Shannon"),
+    'soma':      ('soma',              "SOMA-log.txt",        "SOMA.pgn",        "SOMA"),
+    'torres':    ('torres',            "Torres-log.txt",      "Torres.pgn",      "El Ajedrecista"),
+    'bern':      ('bernstein',         "Bernstein-log.txt",   "Bernstein.pgn",   "Bernstein"),
+    'rmove':     ('rmove',             "RMove-log.txt",       "RMove.pgn",       "Random Mover"),
+    'adapt':     ('adapt',             "Adapt-log.txt",       "Adapt.pgn",       "Simple Adaptive Engine"),
+}
+
+if sys.argv[-1] in ENGINES:
+    key = sys.argv[-1]
 else:
-    if 'linux' in sys.platform:
-        import pyturochamp_multi as p
-        lf = "PyTuroChamp-log.txt"; mf = "PyTuroChamp.pgn"; nm = "PyTuroChamp Multi-Core"
-    else:
-        import pyturochamp as p
-        lf = "PyTuroChamp-log.txt"; mf = "PyTuroChamp.pgn"; nm = "PyTuroChamp"
+    key = 'ptc_multi' if IS_LINUX else 'ptc'
+mod, lf, mf, nm = ENGINES[key]
+p = importlib.import_module(mod)
+GETMOVE = p.getmove
 
 p.Chess960 = False  # Chess960 mode off by default
 
 # --- Optional logging ---
 LOG_ENABLE = os.getenv("PTC_LOG", "0").lower() in ("1","true","yes","on")
 LOG_PATH = os.getenv("PTC_LOG_FILE", "")
+
+class _NullLog:
+    "Stands in for the log file when logging is off"
+    def write(self, b): pass
+    def flush(self): pass
+
 try:
-    log = open(LOG_PATH or lf, 'w') if LOG_ENABLE else None
+    log = io.open(LOG_PATH or lf, 'wb', buffering=65536) if LOG_ENABLE else _NullLog()
 except:
-    log = None
+    log = _NullLog()
     print("# Could not create log file")
 
-def print2(x):
-    print(x, flush=True)
-    if log:
-        log.write("< %s\n" % x)
-        log.flush()
-
-d = ''
+# bound once, so nothing is encoded or concatenated when logging is off
+if isinstance(log, _NullLog):
+    def log_line(s, prefix=b""):
+        pass
+else:
+    def log_line(s, prefix=b""):
+        "Append line(s) s to the log, each prefixed with the bytes prefix"
+        b = s.encode()
+        if prefix and b"\n" in b:
+            b = b.replace(b"\n", b"\n" + prefix)
+        log.write(prefix + b + b"\n")
+
+def print2(fmt: str, *args) -> None:
+    "Send a line to the GUI (and the log), formatting fmt % args if args are given"
+    x = fmt % args if args else fmt
+    sys.stdout.write(x)
+    sys.stdout.write('\n')
+    if FLUSH:
+        sys.stdout.flush()
+    log_line(x, b"< ")
+
+def set_chess960(v):
+    p.Chess960 = v.lower() == 'true'
+
+# setoption name (lowercase, interned) -> handler taking the value token
+SETOPT = {
+    'uci_chess960': set_chess960,
+    'maxplies':     lambda v: setattr(p, 'MAXPLIES', int(v)),
+    'qplies':       lambda v: setattr(p, 'QPLIES', int(v)),
+    'pstab':        lambda v: setattr(p, 'PSTAB', float(v)),
+    'matetest':     lambda v: setattr(p, 'MATETEST', v.lower() == 'true'),
+}
+
+# UCI options advertised per engine name; all of them are handled by SETOPT.
+# maxplies is not advertised: the UCI search sets p.MAXPLIES itself.
+OPT_960 = "option name UCI_Chess960 type check default false"
+OPTIONS = {
+    'PyTuroChamp': [OPT_960,
+        "option name qplies type spin default 7 min 0 max 64",
+        "option name pstab type string default 0",
+        "option name matetest type check default true"],
+    'PyTuroChamp Multi-Core': [OPT_960,
+        "option name qplies type spin default 3 min 0 max 64",
+        "option name pstab type string default 0",
+        "option name matetest type check default false"],
+    'Newt': [OPT_960,
+        "option name qplies type spin default 6 min 0 max 64",
+        "option name pstab type string default 0.1",
+        "option name matetest type check default true"],
+    'Bare': [OPT_960,
+        "option name pstab type string default 0.5",
+        "option name matetest type check default true"],
+    'Plan': [OPT_960],
+    'Shannon': [OPT_960,
+        "option name qplies type spin default 7 min 0 max 64",
+        "option name matetest type check default true"],
+    'SOMA': [OPT_960,
+        "option name matetest type check default true"],
+    'Bernstein': [OPT_960,
+        "option name matetest type check default true"],
+    'El Ajedrecista': [OPT_960],
+    'Random Mover': [OPT_960],
+}
+
+d = None
 search_thread = None
-stop_flag = False
+STOP = threading.Event()   # set to stop the running search
+# engines that can end a search early take the event as getmove(stop=...);
+# they either raise SearchAborted or return what they found so far
+SEARCH_KW = {'stop': STOP} if hasattr(p, 'STOP') else {}
+ABORT = getattr(p, 'SearchAborted', ())
 last_result = None  # holds latest (t, r) from p.getmove
+search_pending = False  # a 'go' is waiting for its bestmove
+emit_lock = threading.Lock()
+last_fen = ''       # FEN the board was set up from (STARTING_FEN for startpos)
+last_moves = []     # UCI moves played on d since last_fen
+pgn_game = pgn_node = pgn_compc = None
+pgn_plies = 0
+pgn_dirty = False
 
 # ========================
 # Search functions
 # ========================
 
+INLINE_DEPTH = 3    # timed searches up to this depth run without a thread
+
 def _think_loop(depth_target=None):
     """
     Iterative deepening: increase p.MAXPLIES from 1 up to depth_target (or 64 if None).
     Emits bestmove when done if not interrupted.
     """
-    global last_result, stop_flag
+    global last_result
     max_d = depth_target if depth_target is not None else 64
-    if not d:
+    if d is None:
         newgame()
+    # search a private copy: an aborted search leaves it mid-line, and stop
+    # may push the bestmove onto d while the current iteration unwinds
+    b = d.copy()
     for dd in range(1, max_d + 1):
-        if stop_flag:
+        if STOP.is_set():
             return
         try:
             p.MAXPLIES = dd
         except Exception:
             pass
-        t_res, r_res = p.getmove(d, silent=True)
+        try:
+            t_res, r_res = GETMOVE(b, silent=True, **SEARCH_KW)
+        except ABORT:
+            return
+        # a completed iteration is valid even if stop came in meanwhile
         if r_res:
             last_result = (t_res, r_res)
-        if stop_flag:
+        if STOP.is_set():
             return
     # finished normally -> emit bestmove
-    if last_result and last_result[1]:
-        move(last_result[1])
-    else:
-        print2("bestmove 0000" if is_uci else "move 0000")
+    finish_search(last_result)
+
+def finish_search(res):
+    """
+    Send the bestmove for the pending 'go', or 0000 if there is no move.
+    Only the first call after a 'go' sends anything.
+    """
+    global search_pending, last_result
+    with emit_lock:
+        if not search_pending:
+            return
+        search_pending = False
+        last_result = None
+        if res and res[1]:
+            move(res[1])
+        else:
+            print2("bestmove 0000" if is_uci else "move 0000")
 
-def start_search(go_line):
+def start_search(toks: list) -> None:
     """
-    Parse 'go ...' line and decide between synchronous (depth only) and async search.
+    Parse tokenized 'go ...' line and decide between synchronous (depth only) and async search.
     """
-    global search_thread, stop_flag, last_result
-    stop_flag = False
+    global search_thread, last_result, search_pending
+    wait_search()
+    STOP.clear()
     last_result = None
     depth = None
     movetime = None
     wtime = btime = None
-    toks = go_line.split()
     if "depth" in toks:
         try: depth = int(toks[toks.index("depth")+1])
         except Exception: depth = None
@@ -142,178 +225,324 @@ def start_search(go_line):
         except Exception:
             try: p.DEPTH = depth
             except Exception: pass
-        t_res, r_res = p.getmove(d, silent=True)
+        t_res, r_res = GETMOVE(d, silent=True)
         if r_res:
             move(r_res)
         else:
             print2("bestmove 0000")
         return
 
+    search_pending = True
+
+    # Shallow timed searches finish quickly: skip the thread start/join
+    if depth is not None and depth <= INLINE_DEPTH:
+        _think_loop(depth)
+        return
+
     # Otherwise: background search
     search_thread = threading.Thread(target=_think_loop, args=(depth,), daemon=True)
     search_thread.start()
 
 def stop_search_and_output():
     """
-    Set stop flag, join, and output the last stored bestmove (if any).
+    Set stop flag, join, and output the last stored bestmove. If the search
+    was stopped before its first iteration finished, play the first legal
+    move instead so that every 'go' gets exactly one bestmove.
     """
-    global stop_flag, search_thread, last_result
-    if search_thread is None and not last_result:
+    global search_thread
+    if not search_pending:
         return
 
-    stop_flag = True
+    STOP.set()
     if search_thread is not None:
         search_thread.join(timeout=0.2)
+        if not search_thread.is_alive():
+            search_thread = None
+
+    res = last_result
+    if not (res and res[1]):
+        wait_search()
+        res = last_result
+    if not (res and res[1]):
+        # no time for another search (Newt would run a full timed one):
+        # any legal move will do
+        mv = next(iter(d.legal_moves), None)
+        res = (0, [d.uci(mv)]) if mv else None
+    finish_search(res)
+
+def wait_search():
+    """
+    Abort and join a background search that is still unwinding after stop:
+    the engines keep their search state in module globals, so two searches
+    must never overlap.
+    """
+    global search_thread
+    if search_thread is not None:
+        STOP.set()
+        search_thread.join()
         search_thread = None
 
-    if last_result and last_result[1]:
-        move(last_result[1])
-
 # ========================
 # Game handling
 # ========================
 
-def move(r):
+def move(r: list) -> None:
     rm = r[0]
     d.push_uci(rm)
-    print2("bestmove %s" % rm if is_uci else "move %s" % rm)
+    last_moves.append(rm)
+    print2("bestmove %s" if is_uci else "move %s", rm)
     pgn()
 
-def pgn():
+def pgn() -> None:
+    global pgn_node, pgn_plies, pgn_compc, pgn_dirty
     if not PGN_ENABLE:
         return
 
-    game = chess.pgn.Game.from_board(d)
-    now = datetime.datetime.now()
-    game.headers["Date"] = now.strftime("%Y.%m.%d")
-    if p.COMPC == c.WHITE:
-        game.headers["White"] = nm
-        game.headers["Black"] = "User"
-    else:
-        game.headers["Black"] = nm
-        game.headers["White"] = "User"
-    if PGN_ENABLE:
-        try:
-            with open(mf, 'w') as f:
-                f.write(str(game) + '\n\n\n')
-        except:
-            print2("# Could not write PGN file")
+    # append only the moves played since the last call
+    for mv in d.move_stack[pgn_plies:]:
+        pgn_node = pgn_node.add_variation(mv)
+    pgn_plies = len(d.move_stack)
+
+    game = pgn_game
+    if p.COMPC != pgn_compc:
+        pgn_compc = p.COMPC
+        if p.COMPC == c.WHITE:
+            game.headers["White"] = nm
+            game.headers["Black"] = "User"
+        else:
+            game.headers["Black"] = nm
+            game.headers["White"] = "User"
+    pgn_dirty = True
+
+def flush_pgn() -> None:
+    "Write the PGN file if moves were added since the last write"
+    global pgn_dirty
+    if not pgn_dirty:
+        return
+    pgn_dirty = False
+    try:
+        with open(mf, 'w') as f:
+            f.write(str(pgn_game) + '\n\n\n')
+    except:
+        print2("# Could not write PGN file")
+
+def pgn_reset() -> None:
+    "Start a new PGN record for the current board"
+    global pgn_game, pgn_node, pgn_plies, pgn_compc
+    if not PGN_ENABLE:
+        return
+    pgn_game = chess.pgn.Game.from_board(d)
+    pgn_game.headers["Date"] = datetime.date.today().strftime("%Y.%m.%d")
+    pgn_node = pgn_game.end()
+    pgn_plies = len(d.move_stack)
+    pgn_compc = None
 
 def newgame():
-    global d
-    if p.Chess960:
-        d = c.Board(chess960=True)
+    global d, last_fen, last_moves
+    if d is None:
+        d = c.Board(chess960=p.Chess960)
     else:
-        d = c.Board()
+        # reuse the board object instead of allocating a new one
+        d.chess960 = p.Chess960
+        d.reset()
+    last_fen = c.STARTING_FEN
+    last_moves = []
+    pgn_reset()
 
 def fromfen(fen):
-    global d
+    "Set up the board from fen; returns False (leaving d as it was) if fen is bad"
+    global d, last_fen, last_moves
     try:
-        if p.Chess960:
-            d = c.Board(fen, chess960=True)
+        if d is None:
+            d = c.Board(fen, chess960=p.Chess960)
         else:
-            d = c.Board(fen)
+            d.chess960 = p.Chess960
+            d.set_fen(fen)
     except:
         print2("Bad FEN")
+        return False
+    last_fen = fen
+    last_moves = []
+    pgn_reset()
+    return True
+
+# 'go' parameter -> Newt module attribute
+NEWT_TC = {
+    'wtime':     'wtime',
+    'btime':     'btime',
+    'movestogo': 'movestogo',
+    'movetime':  'movetime',
+    'nodes':     'MAXNODES',
+}
+
+def set_newt_time(xx: list) -> None:
+    it = iter(xx)
+    for k in it:
+        if k in NEWT_TC:
+            v = next(it, None)
+            if v is not None:
+                setattr(p, NEWT_TC[k], int(v))
+
+# ========================
+# Command handlers
+# ========================
 
-def set_newt_time(line):
-    xx = line.split()
-    for x in range(len(xx)):
-        if xx[x] == 'wtime': p.wtime = int(xx[x+1])
-        if xx[x] == 'btime': p.btime = int(xx[x+1])
-        if xx[x] == 'movestogo': p.movestogo = int(xx[x+1])
-        if xx[x] == 'movetime': p.movetime = int(xx[x+1])
-        if xx[x] == 'nodes': p.MAXNODES = int(xx[x+1])
+def h_xboard(toks: list) -> None:
+    global is_uci
+    is_uci = False
+    print2('feature myname="%s" setboard=1 done=1', nm)
+
+def h_quit(toks: list) -> None:
+    STOP.set()
+    if search_thread is not None:
+        search_thread.join(timeout=0.2)
+    flush_pgn()
+    log.flush()
+    sys.exit(0)
+
+def h_new(toks: list) -> None:
+    stop_search_and_output()
+    flush_pgn()
+    newgame()
+
+def h_uci(toks: list) -> None:
+    global is_uci
+    is_uci = True
+    print2("id name %s", nm)
+    print2("id author Martin C. Doege")
+    if nm in OPTIONS:
+        print2('\n'.join(OPTIONS[nm]))
+    print2("uciok")
+
+def h_ucinewgame(toks: list) -> None:
+    stop_search_and_output()
+    flush_pgn()
+    newgame()
+
+def h_setoption(toks: list) -> None:
+    if len(toks) >= 5 and toks[1] == 'name' and toks[3] == 'value':
+        so = SETOPT.get(sys.intern(toks[2].lower()))
+        if so:
+            try:
+                so(toks[4])
+            except ValueError:
+                print2("info string Bad value for option %s: %s", toks[2], toks[4])
+
+def h_position(toks: list) -> None:
+    global last_fen, last_moves
+    if toks[1:2] == ['startpos']:
+        mm = toks[3:]
+        # GUIs resend the whole game every ply: only push the new moves
+        n = len(last_moves)
+        if last_fen != c.STARTING_FEN or mm[:n] != last_moves:
+            newgame()
+            n = 0
+        for mo in mm[n:]: d.push_uci(mo)
+        last_moves = mm
+
+    elif toks[1:2] == ['fen']:
+        if len(toks) > 6 and toks[6] == 'moves':
+            toks[6:6] = ['0', '1']
+        ff = ' '.join(toks[2:8])
+        mm = toks[9:]
+        new = mm
+        n = len(last_moves)
+        if d is not None and ff == last_fen and mm[:n] == last_moves:
+            new = mm[n:]
+        elif d is None or d.fen() != ff:
+            # keep the game history if the FEN is just the current position
+            if not fromfen(ff):
+                return
+        for mo in new: d.push_uci(mo)
+        last_fen = ff
+        last_moves = mm
+
+def h_isready(toks: list) -> None:
+    if d is None: newgame()
+    print2("readyok")
+
+def h_setboard(toks: list) -> None:
+    fromfen(' '.join(toks[1:]))
+
+def h_go(toks: list) -> None:
+    if d is None: newgame()
+    if nm == 'Newt': set_newt_time(toks)
+    start_search(toks)
+
+def h_stop(toks: list) -> None:
+    r = last_result
+    stop_search_and_output()
+    log_line(str(r[1]) if r else "0000", b"move ")
+    log.flush()
+
+def h_usermove(l: str) -> None:
+    if d is None: newgame()
+    m = MOVE_RE.match(l)
+    if m:
+        l = m.group(1) + (m.group(2) or '').lower()
+        d.push_uci(l)
+        last_moves.append(l)
+        pgn()
+        wait_search()
+        t, r = GETMOVE(d, silent=True)
+        if r:
+            move(r)
+
+HANDLERS = {
+    'xboard':     h_xboard,
+    'quit':       h_quit,
+    'new':        h_new,
+    'uci':        h_uci,
+    'ucinewgame': h_ucinewgame,
+    'isready':    h_isready,
+    'setboard':   h_setboard,
+    'stop':       h_stop,
+    'force':      h_stop,
+    '?':          h_stop,
+    'position':   h_position,
+    'go':         h_go,
+    'setoption':  h_setoption,
+}
 
 # ========================
 # Main loop
 # ========================
 
+STOPCMDS = ('stop', 'force', '?', 'quit')
+
+def _reader():
+    """
+    Read GUI commands on a separate thread so a running search sees
+    stop/?/force/quit right away instead of when the main loop gets to it.
+    Queues None on EOF.
+    """
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        line = line.strip()
+        if line in STOPCMDS:
+            STOP.set()
+        inq.put(line)
+    inq.put(None)
+
+inq = queue.Queue()
+threading.Thread(target=_reader, daemon=True).start()
+
 while True:
-    l = ''
     try:
-        l = input() if sys.version >= '3' else raw_input()
+        l = inq.get()
     except KeyboardInterrupt:
-        if not is_uci:
-            pass
+        continue
+    if l is None:
+        h_quit([])
     if l:
-        if log:
-            log.write(l + '\n'); log.flush()
-
-        if l == 'xboard':
-            is_uci = False
-            print2('feature myname="%s" setboard=1 done=1' % nm)
-
-        elif l == 'quit':
-            stop_flag = True
-            if search_thread is not None:
-                search_thread.join(timeout=0.2)
-            sys.exit(0)
-
-        elif l == 'new':
-            stop_search_and_output()
-            newgame()
-
-        elif l == 'uci':
-            is_uci = True
-            print2(f"id name {nm}")
-            print2("id author Martin C. Doege")
-            # (options unchanged for brevity)
-            if nm != 'Simple Adaptive Engine':
-                print2("option name UCI_Chess960 type check default false")
-            print2("uciok")
-
-        elif l == 'ucinewgame':
-            stop_search_and_output()
-            newgame()
-
-        elif 'position startpos moves' in l:
-            mm = l.split()[3:]
-            newgame()
-            for mo in mm: d.push_uci(mo)
-
-        elif 'position fen' in l:
-            if l.split()[6] == 'moves':
-                l = ' '.join(l.split()[:6] + ['0', '1'] + l.split()[6:])
-            ff = ' '.join(l.split()[2:8])
-            mm = l.split()[9:]
-            if d:
-                old = d.copy(); fromfen(ff)
-                if old.fen() == ff:
-                    for mo in mm: old.push_uci(mo)
-                    d = old.copy()
-                else:
-                    for mo in mm: d.push_uci(mo)
-            else:
-                fromfen(ff)
-                for mo in mm: d.push_uci(mo)
-
-        elif l == 'isready':
-            if not d: newgame()
-            print2("readyok")
-
-        elif 'setboard' in l:
-            fen = l.split(' ', 1)[1]
-            fromfen(fen)
-
-        elif l[:2] == 'go':
-            if not d: newgame()
-            if nm == 'Newt': set_newt_time(l)
-            start_search(l)
-
-        elif l == 'stop' or l == 'force' or l == '?':
-            stop_search_and_output()
-            if log:
-                log.write("move %s\n" % (last_result[1] if last_result else "0000"))
-                log.flush()
-
+        log_line(l)
+        toks = l.split()
+        if not toks:
+            continue
+        h = HANDLERS.get(toks[0])
+        if h:
+            h(toks)
         else:
-            if not d: newgame()
-            if len(l) >= 4 and l[0] in abc and l[2] in abc and l[1] in nn and l[3] in nn:
-                if len(l) == 6:
-                    l = l[:4] + 'q'
-                d.push_uci(l)
-                pgn()
-                t, r = p.getmove(d, silent=True)
-                if r:
-                    move(r)
+            h_usermove(l)
@@ -30,6 +30,11 @@ PlayerAdvantage = 0	# If not 0, keep the evaluation at least this many decipawns
 
 b = c.Board()
 NODES = 0
+STOP = None	# threading.Event passed to getmove(); the search is aborted when it is set
+		#   (checked every 16 nodes, since nodes are slow here)
+
+class SearchAborted(Exception):
+	"Raised inside the search when STOP is set"
 
 ### Various test positions, with White to play:
 
@@ -190,6 +195,8 @@ def searchmax(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 15 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if MATETEST and ply < 2 and b.is_check():
 		res = b.result(claim_draw = True)
 		if res == '0-1':
@@ -225,6 +232,8 @@ def searchmin(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 15 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if MATETEST and ply < 2 and b.is_check():
 		res = b.result(claim_draw = True)
 		if res == '0-1':
@@ -309,9 +318,11 @@ def getindex(ll):
 		else:
 			return 0
 
-def getmove(b, silent = False, usebook = False):
+def getmove(b, silent = False, usebook = False, stop = None):
 	"Get move list for board"
-	global COMPC, PLAYC, MAXPLIES, NODES
+	global COMPC, PLAYC, MAXPLIES, NODES, STOP
+
+	STOP = stop
 
 	lastpos = getpos(b)
 	ll = []
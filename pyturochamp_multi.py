@@ -34,6 +34,8 @@ BlunderPercent = 0	# Percent chance of blundering this move
 b = c.Board()
 
 ptc_worker.start()
+STOP = None	# threading.Event passed to getmove(); the search is aborted when it is set
+SearchAborted = ptc.SearchAborted
 
 def pm():
 	if COMPC == c.WHITE:
@@ -55,9 +57,11 @@ def getindex(ll):
 		mm = [x for x in inds if (abs(x[0] - vals[0]) < err)]
 		return choice(mm)[1]
 
-def getmove(b, silent = False, usebook = False):
+def getmove(b, silent = False, usebook = False, stop = None):
 	"Get move list for board"
-	global COMPC, PLAYC, MAXPLIES
+	global COMPC, PLAYC, MAXPLIES, STOP
+
+	STOP = stop
 
 	lastpos = ptc.getpos(b)
 	ll = []
@@ -81,16 +85,29 @@ def getmove(b, silent = False, usebook = False):
 	nummov = len(inlist)
 
 	start = time.time()
-	while len(ll) < nummov:
+	sent = got = 0
+	while got < nummov:
 		#if len(inlist) > 0:
 		#	print(len(inlist), len(ll), nummov)
+		if STOP is not None and STOP.is_set() and not ptc_worker.abort.is_set():
+			ptc_worker.abort.set()
+			inlist = []
+			nummov = sent	# only wait for the replies to jobs already sent
 		if len(inlist):
 			ptc_worker.urlq.put_nowait(
 				(b.copy(), inlist.pop(), lastpos, COMPC, cr0, MAXPLIES, QPLIES, PSTAB, PDEAD, MATETEST))
+			sent += 1
 		try:
-			ll.append(ptc_worker.urlr.get_nowait())
+			r = ptc_worker.urlr.get_nowait()
 		except Empty:
 			pass
+		else:
+			got += 1
+			if r is not None:
+				ll.append(r)
+	if ptc_worker.abort.is_set():
+		ptc_worker.abort.clear()
+		raise SearchAborted
 	ll.sort(key = lambda m: m[1] + 1000 * m[2])
 	if COMPC == c.WHITE:
 		ll.reverse()
@@ -15,6 +15,10 @@ PAWNRULE  = True	# use pawn criteria
 
 b = c.Board()
 NODES = 0
+STOP = None	# threading.Event passed to getmove(); the search is aborted when it is set
+
+class SearchAborted(Exception):
+	"Raised inside the search when STOP is set"
 
 def getpawnfile(b, col):
 	pf = 10 * [0]
@@ -127,6 +131,8 @@ def searchmax(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 1023 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if MATETEST:
 		res = b.result(claim_draw = True)
 		if res == '0-1':
@@ -162,6 +168,8 @@ def searchmin(b, ply, alpha, beta):
 	global NODES
 
 	NODES += 1
+	if not NODES & 1023 and STOP is not None and STOP.is_set():
+		raise SearchAborted
 	if MATETEST:
 		res = b.result(claim_draw = True)
 		if res == '0-1':
@@ -218,9 +226,11 @@ def pm():
 	else:
 		return -1
 
-def getmove(b, silent = False, usebook = False):
+def getmove(b, silent = False, usebook = False, stop = None):
 	"Get move list for board"
-	global COMPC, PLAYC, MAXPLIES, NODES
+	global COMPC, PLAYC, MAXPLIES, NODES, STOP
+
+	STOP = stop
 
 	ll = []
 	NODES = 0